@@ -0,0 +1,19 @@
+"""Shared configuration for the API tests, imported by conftest.py and test_api.py"""
+
+import os
+from functools import cache
+
+from dotenv import load_dotenv
+
+
+@cache
+def get_config():
+    """Load .env and read the test settings once per process"""
+    load_dotenv()
+    return {
+        # This must match API_AUTH_TOKEN in the server's .env; a missing token fails here, before any request
+        "auth_token": os.environ["API_AUTH_TOKEN"],
+        # A literal loopback address skips the getaddrinfo lookup for every new connection, and the
+        # attempt on ::1 first where localhost resolves to IPv6 but the server only listens on IPv4
+        "base_url": os.getenv("API_BASE_URL", "http://127.0.0.1:8000"),
+    }
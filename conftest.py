@@ -0,0 +1,12 @@
+"""pytest hooks for the API tests"""
+
+from api_test_config import get_config
+
+
+def pytest_report_header(config):
+    # Show which server the run targets at the top of the pytest output. The offline tests run
+    # without API settings, so a missing token is only reported here.
+    try:
+        return f"API server: {get_config()['base_url']}"
+    except KeyError as e:
+        return f"API server: not configured ({e.args[0]} is not set)"
@@ -1,15 +1,28 @@
 import os
+# Split the cores between uvicorn workers unless the user set a thread count; set before numpy, torch and
+# onnxruntime create their thread pools
+USER_SET_OMP_NUM_THREADS = "OMP_NUM_THREADS" in os.environ
+os.environ.setdefault(
+    "OMP_NUM_THREADS", str(max(1, (os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY") or 1)))
+)
+import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Header, Depends, UploadFile, File, Form, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
+import torch
 
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Settings
+from llama_index.core import Settings
 # Option 2: Using Groq (API service) - uncomment these if using Groq instead
 from llama_index.llms.groq import Groq
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+# Option 3: Local OpenAI-compatible inference servers with dynamic batching
+from llama_index.llms.openai_like import OpenAILike
+from llama_index.embeddings.openai_like import OpenAILikeEmbedding
+
+from rag_pipeline import router, set_embedding_id, warm_up_models
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,7 +35,8 @@ load_dotenv()
 app = FastAPI(
     title="RAG Document Q&A API",
     description="A RAG-based API for answering questions from PDF documents using Llama 3.1 8B",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -33,13 +47,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Define API Request/Response Models
-class HackathonRequest(BaseModel):
-    documents: str  # URL to the PDF document
-    questions: List[str]
+# Compress answer payloads for clients that accept gzip; SSE streams are left uncompressed
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Document Q&A endpoints shared with the other app
+app.include_router(router)
+
+def load_embed_model():
+    """Load MiniLM as an INT8-quantized ONNX model, falling back to the PyTorch weights"""
+    model_name = "sentence-transformers/all-MiniLM-L6-v2"
+
+    # A local Infinity server batches embedding requests from all workers into shared forward passes:
+    # infinity_emb v2 --model-id sentence-transformers/all-MiniLM-L6-v2 --engine ctranslate2 --port 7997
+    embedding_api_base = os.getenv("EMBEDDING_API_BASE")
+    if embedding_api_base:
+        logger.info(f"Using embedding server at {embedding_api_base}")
+        set_embedding_id(f"{model_name}:server:{embedding_api_base}")
+        return OpenAILikeEmbedding(
+            model_name=model_name,
+            api_base=embedding_api_base,
+            api_key=os.getenv("EMBEDDING_API_KEY", "fake"),
+            embed_batch_size=64
+        )
+
+    backend = os.getenv("EMBED_BACKEND", "onnx")
+
+    if backend == "onnx":
+        # The model repo ships pre-quantized ONNX files; the VNNI build runs matmuls on int8 dot-product
+        # instructions. Use onnx/model_quint8_avx2.onnx on CPUs without AVX-512 VNNI.
+        onnx_file = os.getenv("EMBED_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+        try:
+            embed_model = HuggingFaceEmbedding(
+                model_name=model_name,
+                embed_batch_size=64,
+                backend="onnx",
+                model_kwargs={"file_name": onnx_file}
+            )
+            logger.info(f"Loaded ONNX embedding model from {onnx_file}")
+            set_embedding_id(f"{model_name}:onnx:{onnx_file}")
+            return embed_model
+        except Exception as e:
+            logger.warning(f"Failed to load ONNX embedding model, falling back to PyTorch: {e}")
 
-class HackathonResponse(BaseModel):
-    answers: List[str]
+    set_embedding_id(f"{model_name}:torch")
+    return HuggingFaceEmbedding(
+        model_name=model_name,
+        embed_batch_size=64
+    )
 
 # Configure global settings for LlamaIndex
 def configure_llama_index():
@@ -59,20 +113,35 @@ def configure_llama_index():
         #     base_url="http://localhost:11434"
         # )
         
+        # Option 3: Using a local OpenAI-compatible server with continuous batching (e.g. vLLM)
+        # Start it with: vllm serve meta-llama/Llama-3.1-8B-Instruct --port 8001
+        llm_api_base = os.getenv("LLM_API_BASE")
+        if llm_api_base:
+            llm = OpenAILike(
+                model=os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"),
+                api_base=llm_api_base,
+                api_key=os.getenv("LLM_API_KEY", "fake"),
+                is_chat_model=True,
+                context_window=int(os.getenv("LLM_CONTEXT_WINDOW", 8192))
+            )
+            logger.info(f"Using LLM server at {llm_api_base}")
+
         # Option 2: Using Groq (uncomment this section if using Groq instead)
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if not groq_api_key:
-            raise ValueError("GROQ_API_KEY is not set in the environment.")
-        
-        llm = Groq(
-            model="llama-3.1-8b-instant",
-            api_key=groq_api_key
-        )
+        else:
+            groq_api_key = os.getenv("GROQ_API_KEY")
+            if not groq_api_key:
+                raise ValueError("GROQ_API_KEY is not set in the environment.")
+
+            llm = Groq(
+                model="llama-3.1-8b-instant",
+                api_key=groq_api_key
+            )
         
+        # Use this worker's share of the cores without PyTorch spawning more threads than that
+        torch.set_num_threads(int(os.environ["OMP_NUM_THREADS"]))
+
         # Use HuggingFace embeddings for Groq setup
-        embed_model = HuggingFaceEmbedding(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        embed_model = load_embed_model()
         
         # Set global settings
         Settings.llm = llm
@@ -86,8 +155,11 @@ def configure_llama_index():
         logger.error(f"Failed to configure LlamaIndex: {e}")
         raise
 
-# Configure on startup
-llm = configure_llama_index()
+# Configure and warm up on startup
+@app.on_event("startup")
+async def startup():
+    configure_llama_index()
+    warm_up_models(max_tokens=1)
 
 @app.get("/")
 async def root():
@@ -104,146 +176,6 @@ async def health_check():
         "provider": "Groq"  # Change to "Groq" if using Groq
     }
 
-def validate_token(authorization: str = Header(...)):
-    expected_token = f"Bearer {os.getenv('API_AUTH_TOKEN')}"
-    print(expected_token, authorization)
-    if authorization != expected_token:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-@app.post("/api/v1/hackrx/run", response_model=HackathonResponse)
-async def run_submission(
-    request: Request,
-    token: None = Depends(validate_token)
-):
-    """
-    Main RAG endpoint that processes documents and answers questions using Llama 3.1 8B.
-    Supports both JSON and form data formats.
-    """
-    try:
-        content_type = request.headers.get("content-type", "")
-        
-        # Handle JSON request (new format)
-        if "application/json" in content_type:
-            data = await request.json()
-            questions = data.get("questions", [])
-            # Map 'documents' field to document_url for compatibility
-            document_url = data.get("documents") or data.get("document_url")
-            file = None
-            
-        # Handle form data (existing format)
-        elif "multipart/form-data" in content_type:
-            form = await request.form()
-            
-            # Handle questions from form
-            if "questions" in form:
-                questions_raw = form["questions"]
-                try:
-                    import json
-                    questions = json.loads(questions_raw) if isinstance(questions_raw, str) else [questions_raw]
-                except:
-                    questions = [questions_raw]
-            else:
-                questions = []
-                for key, value in form.items():
-                    if key.startswith("question"):
-                        questions.append(value)
-            
-            document_url = form.get("document_url")
-            file = form.get("file")
-            
-        else:
-            raise HTTPException(status_code=400, detail="Content-Type must be application/json or multipart/form-data")
-
-        # Validate input
-        if not questions or not isinstance(questions, list):
-            raise HTTPException(status_code=400, detail="Questions must be provided as a non-empty list")
-
-        logger.info(f"Number of questions received: {len(questions)}")
-        documents = []
-
-        # 1. Load from uploaded file (for blob-based or local PDF uploads)
-        if file is not None:
-            logger.info(f"Processing uploaded file: {file.filename}")
-            try:
-                import tempfile
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                    tmp_file.write(await file.read())
-                    tmp_file_path = tmp_file.name
-
-                reader = SimpleDirectoryReader(input_files=[tmp_file_path])
-                documents = reader.load_data()
-
-                os.unlink(tmp_file_path)
-                logger.info(f"Successfully loaded {len(documents)} document chunks from uploaded file")
-
-            except Exception as e:
-                logger.error(f"Failed to read uploaded file: {e}")
-                raise HTTPException(status_code=400, detail=f"Failed to read uploaded file: {str(e)}")
-
-        # 2. Load from URL if no file was uploaded
-        elif document_url and document_url.startswith(("http://", "https://")):
-            logger.info(f"Processing document from URL: {document_url}")
-            try:
-                import requests
-                import tempfile
-
-                response = requests.get(document_url)
-                response.raise_for_status()
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                    tmp_file.write(response.content)
-                    tmp_file_path = tmp_file.name
-
-                reader = SimpleDirectoryReader(input_files=[tmp_file_path])
-                documents = reader.load_data()
-
-                os.unlink(tmp_file_path)
-                logger.info(f"Successfully loaded {len(documents)} document chunks from URL")
-
-            except Exception as e:
-                logger.error(f"Failed to load document from URL: {e}")
-                raise HTTPException(status_code=400, detail=f"Failed to load document from URL: {str(e)}")
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="No valid document provided. Provide either a file upload or a valid document URL."
-            )
-
-        # 3. Create the Vector Index
-        try:
-            index = VectorStoreIndex.from_documents(documents)
-            logger.info("Successfully created vector index")
-        except Exception as e:
-            logger.error(f"Failed to create index: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to create document index: {str(e)}")
-
-        # 4. Create the Query Engine
-        query_engine = index.as_query_engine(similarity_top_k=3, response_mode="compact")
-        answers_with_sources = []
-
-        # 5. Process each question
-        for i, question in enumerate(questions):
-            try:
-                logger.info(f"Processing question {i+1}/{len(questions)}: {question[:100]}...")
-                response = query_engine.query(question)
-                answer_text = str(response)
-                answers_with_sources.append(answer_text)
-                logger.info(f"Successfully processed question {i+1}")
-
-            except Exception as e:
-                logger.error(f"Failed to process question {i+1}: {e}")
-                answers_with_sources.append(f"Error processing question: {str(e)}")
-
-        logger.info(f"Successfully processed all {len(questions)} questions")
-        return HackathonResponse(answers=answers_with_sources)
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in run_submission: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    
 @app.post("/api/v1/test")
 async def test_endpoint(request: dict):
     """Test endpoint for debugging"""
@@ -254,7 +186,16 @@ async def test_endpoint(request: dict):
     }
 
 if __name__ == "__main__":
-    import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+    # Worker processes re-import this module and size their thread pools from these. The import above
+    # filled in OMP_NUM_THREADS for a single process, so recompute it unless the user set it.
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if not USER_SET_OMP_NUM_THREADS:
+        os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+    # Index, PDF and answer caches live on disk, so every worker shares their hits.
+    # "auto" picks uvloop where it is installed and falls back to asyncio (e.g. on Windows)
+    uvicorn.run("improved_main:app", host="0.0.0.0", port=port, workers=workers, loop="auto")
 
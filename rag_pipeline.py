@@ -0,0 +1,612 @@
+"""Document Q&A pipeline and /api/v1/hackrx endpoints shared by main.py and improved_main.py"""
+import os
+import asyncio
+import hashlib
+import hmac
+import io
+import shutil
+import tempfile
+import aiofiles
+import diskcache
+import httpx
+import orjson
+from cachetools import LRUCache
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Header, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+import logging
+import numpy as np
+from pypdf import PdfReader
+
+from llama_index.core import VectorStoreIndex, Document, Settings, StorageContext, QueryBundle, load_index_from_storage
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import MetadataMode, NodeWithScore
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryMode, VectorStoreQueryResult
+
+logger = logging.getLogger(__name__)
+
+# Cache locations and the auth token are read at import, so load .env before anything else
+load_dotenv()
+
+router = APIRouter()
+
+# Define API Request/Response Models
+class HackathonRequest(BaseModel):
+    documents: str  # URL to the PDF document
+    questions: List[str]
+
+class HackathonResponse(BaseModel):
+    answers: List[str]
+
+def warm_up_models(**llm_kwargs):
+    """
+    Run a dummy embedding batch and LLM call so the first request does not pay for model loading.
+    llm_kwargs are passed to the LLM call to cap its output at one token; the option name depends on the LLM.
+    """
+    try:
+        Settings.embed_model.get_text_embedding_batch(["warmup"] * 8)
+        logger.info("Embedding model warmed up")
+    except Exception as e:
+        logger.warning(f"Embedding model warm-up failed: {e}")
+
+    try:
+        Settings.llm.complete("ping", **llm_kwargs)
+        logger.info("LLM warmed up")
+    except Exception as e:
+        logger.warning(f"LLM warm-up failed: {e}")
+
+def normalize_embedding(embedding: List[float]) -> np.ndarray:
+    """L2-normalize an embedding so a dot product is cosine similarity"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def quantize_int8(vectors: np.ndarray):
+    """Symmetric per-vector INT8 quantization: q = clamp(round(v / s), -127, 127) with s = max|v| / 127"""
+    scales = np.abs(vectors).max(axis=-1, keepdims=True) / 127
+    scales[scales == 0] = 1
+    quantized = np.clip(np.round(vectors / scales), -127, 127).astype(np.int8)
+    return quantized, scales.squeeze(-1).astype(np.float32)
+
+class Int8VectorStore(SimpleVectorStore):
+    """
+    In-memory vector store that searches INT8-quantized embeddings and reranks the shortlist in FP32.
+    The FP32 embeddings stay in the underlying SimpleVectorStore data so persistence is unchanged.
+    """
+
+    # Candidates rescored in FP32: at least 32, or 4x top_k for larger top_k
+    oversample: int = 4
+    rerank_candidates: int = 32
+
+    _node_ids: List[str] = PrivateAttr(default_factory=list)
+    _quantized: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    def add(self, nodes, **add_kwargs):
+        self._quantized = None
+        return super().add(nodes, **add_kwargs)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs):
+        self._quantized = None
+        super().delete(ref_doc_id, **delete_kwargs)
+
+    def quantize(self):
+        """Quantize the stored embeddings if they changed since the last call"""
+        if self._quantized is not None:
+            return
+        self._node_ids = list(self.data.embedding_dict)
+        if not self._node_ids:
+            # Nothing to search, e.g. a scanned PDF with no extractable text
+            self._quantized = np.empty((0, 0), dtype=np.int8)
+            self._scales = np.empty(0, dtype=np.float32)
+            return
+        vectors = np.asarray([self.data.embedding_dict[node_id] for node_id in self._node_ids], dtype=np.float32)
+        vectors = vectors.reshape(len(self._node_ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self._quantized, self._scales = quantize_int8(vectors / norms)
+
+    def _rerank(self, query_vector: np.ndarray, candidates: np.ndarray, top_k: int):
+        """Rescore the INT8 shortlist with the original FP32 embeddings"""
+        candidate_ids = [self._node_ids[i] for i in candidates]
+        vectors = np.asarray([self.data.embedding_dict[node_id] for node_id in candidate_ids], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1
+        similarities = vectors @ query_vector / norms
+        order = np.argsort(-similarities)[:top_k]
+        return [float(similarities[i]) for i in order], [candidate_ids[i] for i in order]
+
+    def query(self, query: VectorStoreQuery, **kwargs) -> VectorStoreQueryResult:
+        # Filtered and non-default modes keep the exact FP32 implementation
+        if (
+            query.mode != VectorStoreQueryMode.DEFAULT
+            or query.filters is not None
+            or query.node_ids is not None
+            or query.query_embedding is None
+        ):
+            return super().query(query, **kwargs)
+
+        return self.query_batch([query.query_embedding], query.similarity_top_k)[0]
+
+    def query_batch(self, query_embeddings: List[List[float]], similarity_top_k: int) -> List[VectorStoreQueryResult]:
+        """Score every query embedding against every chunk with a single INT8 matmul"""
+        self.quantize()
+        if not self._node_ids or not query_embeddings:
+            return [VectorStoreQueryResult(similarities=[], ids=[]) for _ in query_embeddings]
+
+        query_vectors = np.stack([normalize_embedding(embedding) for embedding in query_embeddings])
+        query_quantized, _ = quantize_int8(query_vectors)
+
+        # Integer dot products accumulate in int32; 127 * 127 * dim overflows int16
+        scores = np.einsum("qd,nd->qn", query_quantized, self._quantized, dtype=np.int32) * self._scales
+
+        top_k = min(similarity_top_k, len(self._node_ids))
+        shortlist = min(max(top_k * self.oversample, self.rerank_candidates), len(self._node_ids))
+        candidates = np.argpartition(-scores, shortlist - 1, axis=1)[:, :shortlist]
+
+        results = []
+        for query_vector, row in zip(query_vectors, candidates):
+            similarities, ids = self._rerank(query_vector, row, top_k)
+            results.append(VectorStoreQueryResult(similarities=similarities, ids=ids))
+        return results
+
+def retrieve_batch(index: VectorStoreIndex, query_embeddings: List[List[float]], similarity_top_k: int) -> List[List[NodeWithScore]]:
+    """Retrieve the top chunks for many questions at once instead of one retriever call per question"""
+    vector_store = index.vector_store
+    if isinstance(vector_store, Int8VectorStore):
+        results = vector_store.query_batch(query_embeddings, similarity_top_k)
+    else:
+        results = [
+            vector_store.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=similarity_top_k))
+            for embedding in query_embeddings
+        ]
+
+    retrieved = []
+    for result in results:
+        node_ids = [index.index_struct.nodes_dict[vector_id] for vector_id in result.ids]
+        nodes = index.docstore.get_nodes(node_ids)
+        retrieved.append([NodeWithScore(node=node, score=score) for node, score in zip(nodes, result.similarities)])
+    return retrieved
+
+class IndexCache(LRUCache):
+    """LRU cache of loaded indexes that drops a document's semantic cache together with its index"""
+
+    def popitem(self):
+        key, index = super().popitem()
+        QUERY_CACHES.pop(key, None)
+        return key, index
+
+# Built indexes keyed by document hash, so a repeated document skips download, parsing and embedding.
+# Each worker keeps the most recently used ones in memory.
+INDEX_CACHE = IndexCache(maxsize=int(os.getenv("INDEX_CACHE_SIZE", 32)))
+INDEX_PERSIST_DIR = os.getenv("INDEX_PERSIST_DIR", ".idx")
+# Persisted indexes beyond this many are deleted, least recently used first
+INDEX_PERSIST_LIMIT = int(os.getenv("INDEX_PERSIST_LIMIT", 256))
+
+# Identifies the embedding model and backend; apps with several backends set it when loading the model
+EMBEDDING_ID: Optional[str] = None
+
+def set_embedding_id(embedding_id: str):
+    """Record which embedding model/backend produced the vectors, for the index cache key"""
+    global EMBEDDING_ID
+    EMBEDDING_ID = embedding_id
+
+def document_cache_key(source: bytes) -> str:
+    """Hash a document URL or uploaded file into an index cache key"""
+    # Include the embedding model and backend so a change never reuses stale vectors
+    embedding_id = EMBEDDING_ID or Settings.embed_model.model_name
+    return hashlib.sha256(embedding_id.encode() + b"\0" + source).hexdigest()
+
+def build_index(documents) -> VectorStoreIndex:
+    """Chunk the documents and embed every chunk in length-sorted batches before indexing"""
+    nodes = Settings.node_parser.get_nodes_from_documents(documents)
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+
+    # Batching similarly sized chunks together keeps padding inside each batch to a minimum
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    embeddings = Settings.embed_model.get_text_embedding_batch(
+        [texts[i] for i in order], show_progress=False
+    )
+    for i, embedding in zip(order, embeddings):
+        nodes[i].embedding = embedding
+
+    # Nodes that already carry an embedding are indexed without calling the model again
+    storage_context = StorageContext.from_defaults(vector_store=Int8VectorStore())
+    return VectorStoreIndex(nodes=nodes, storage_context=storage_context)
+
+def quantize_index(index: VectorStoreIndex):
+    """Build the INT8 search matrix up front so the first query does not pay for it"""
+    if isinstance(index.vector_store, Int8VectorStore):
+        index.vector_store.quantize()
+
+def load_cached_index(key: str) -> Optional[VectorStoreIndex]:
+    """Return the index for a cache key from memory or disk, or None on a miss"""
+    if key in INDEX_CACHE:
+        return INDEX_CACHE[key]
+
+    persist_dir = os.path.join(INDEX_PERSIST_DIR, key)
+    if not os.path.isdir(persist_dir):
+        return None
+
+    try:
+        storage_context = StorageContext.from_defaults(
+            persist_dir=persist_dir,
+            vector_store=Int8VectorStore.from_persist_dir(persist_dir)
+        )
+        index = load_index_from_storage(storage_context)
+        quantize_index(index)
+        INDEX_CACHE[key] = index
+        # Mark the index as recently used so pruning keeps it
+        os.utime(persist_dir)
+        logger.info(f"Loaded persisted vector index from {persist_dir}")
+        return index
+    except Exception as e:
+        logger.warning(f"Failed to load persisted index from {persist_dir}: {e}")
+        # Remove it so the rebuilt index can be persisted in its place
+        shutil.rmtree(persist_dir, ignore_errors=True)
+        return None
+
+def cache_index(key: str, index: VectorStoreIndex):
+    """Keep the index in memory and persist it so it survives restarts"""
+    quantize_index(index)
+    INDEX_CACHE[key] = index
+    persist_dir = os.path.join(INDEX_PERSIST_DIR, key)
+    if os.path.isdir(persist_dir):
+        return
+
+    # Write into a private directory and rename it into place, so a worker building the same document
+    # at the same time can never leave a directory mixing files from both builds
+    tmp_dir = None
+    try:
+        os.makedirs(INDEX_PERSIST_DIR, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=INDEX_PERSIST_DIR, suffix=".part")
+        index.storage_context.persist(persist_dir=tmp_dir)
+        os.rename(tmp_dir, persist_dir)
+        tmp_dir = None
+    except OSError as e:
+        # Another worker persisted this document first; its copy is as good as ours
+        if not os.path.isdir(persist_dir):
+            logger.warning(f"Failed to persist index to {persist_dir}: {e}")
+    except Exception as e:
+        logger.warning(f"Failed to persist index to {persist_dir}: {e}")
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    prune_persisted_indexes()
+
+def prune_persisted_indexes():
+    """Delete the least recently used persisted indexes beyond INDEX_PERSIST_LIMIT"""
+    entries = []
+    try:
+        with os.scandir(INDEX_PERSIST_DIR) as it:
+            for entry in it:
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    # Another worker removed it in the meantime
+                    pass
+    except OSError:
+        return
+
+    entries.sort(reverse=True)
+    for _, path in entries[INDEX_PERSIST_LIMIT:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+class SemanticCache:
+    """Answer cache keyed by question embedding, so paraphrased questions reuse an earlier answer"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embeddings: List[np.ndarray] = []
+        self.answers: List[str] = []
+
+    def lookup(self, embedding: np.ndarray) -> Optional[str]:
+        """Return the cached answer whose question has cosine similarity >= threshold"""
+        if not self.embeddings:
+            return None
+
+        scores = np.dot(np.stack(self.embeddings), embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        # Move the hit to the end so eviction always drops the least recently used entry
+        self.embeddings.append(self.embeddings.pop(best))
+        self.answers.append(self.answers.pop(best))
+        return self.answers[-1]
+
+    def store(self, embedding: np.ndarray, answer: str):
+        self.embeddings.append(embedding)
+        self.answers.append(answer)
+        if len(self.answers) > self.max_entries:
+            del self.embeddings[0]
+            del self.answers[0]
+
+# Exact (document, question) -> answer hits shared by every worker process through SQLite on disk
+ANSWER_CACHE = diskcache.Cache(os.getenv("ANSWER_CACHE_DIR", ".answers"))
+
+# One in-process semantic cache per document index, for paraphrased questions
+QUERY_CACHES: LRUCache = LRUCache(maxsize=INDEX_CACHE.maxsize)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+
+# Shared async HTTP client for document downloads, reusing connections across requests
+HTTP_CLIENT = httpx.AsyncClient(timeout=60, http2=True, follow_redirects=True)
+
+@router.on_event("shutdown")
+async def close_http_client():
+    await HTTP_CLIENT.aclose()
+
+# Downloaded PDFs keyed by URL hash, with the ETag kept in a sidecar file for revalidation
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pdfcache"))
+
+async def fetch_document(document_url: str) -> bytes:
+    """Return the document bytes, downloading them only if the cached copy is missing or stale"""
+    key = hashlib.sha256(document_url.encode()).hexdigest()
+    pdf_path = os.path.join(PDF_CACHE_DIR, f"{key}.pdf")
+    etag_path = f"{pdf_path}.etag"
+
+    # A conditional GET revalidates the cached copy and downloads it if stale in a single round-trip
+    headers = {}
+    if os.path.exists(pdf_path) and os.path.exists(etag_path):
+        async with aiofiles.open(etag_path) as etag_file:
+            headers["If-None-Match"] = await etag_file.read()
+
+    # Stream the download so the event loop keeps serving other requests meanwhile
+    async with HTTP_CLIENT.stream("GET", document_url, headers=headers) as response:
+        if response.status_code == 304:
+            logger.info("Cached PDF is up to date, skipping download")
+            async with aiofiles.open(pdf_path, "rb") as pdf_file:
+                return await pdf_file.read()
+        response.raise_for_status()
+
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        fd, tmp_file_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix=".part")
+        os.close(fd)
+        data = bytearray()
+        try:
+            async with aiofiles.open(tmp_file_path, "wb") as tmp_file:
+                async for chunk in response.aiter_bytes(1 << 20):
+                    data.extend(chunk)
+                    await tmp_file.write(chunk)
+            os.replace(tmp_file_path, pdf_path)
+        except Exception:
+            os.unlink(tmp_file_path)
+            raise
+
+        etag = response.headers.get("ETag")
+        if etag:
+            async with aiofiles.open(etag_path, "w") as etag_file:
+                await etag_file.write(etag)
+        elif os.path.exists(etag_path):
+            os.unlink(etag_path)
+
+    return bytes(data)
+
+def load_pdf_documents(data: bytes, file_name: Optional[str] = None) -> List[Document]:
+    """Parse a PDF from memory into one Document per page that has text"""
+    reader = PdfReader(io.BytesIO(data))
+    documents = []
+    for i, page in enumerate(reader.pages):
+        text = page.extract_text()
+        if not text:
+            continue
+        metadata = {"page_label": str(i + 1)}
+        if file_name:
+            metadata["file_name"] = file_name
+        documents.append(Document(text=text, metadata=metadata))
+    return documents
+
+# Number of chunks retrieved as context for each question
+SIMILARITY_TOP_K = 3
+
+# Caps in-flight LLM calls to stay within provider rate limits. LLM_CONCURRENCY is the limit for the
+# whole server, so each of the WEB_CONCURRENCY worker processes takes an equal share of it
+LLM_SEMAPHORE = asyncio.Semaphore(
+    max(1, int(os.getenv("LLM_CONCURRENCY", 8)) // int(os.getenv("WEB_CONCURRENCY") or 1))
+)
+
+# Built once at import instead of on every request
+EXPECTED_AUTHORIZATION = f"Bearer {os.getenv('API_AUTH_TOKEN')}".encode()
+
+def validate_token(authorization: str = Header(...)):
+    # Constant-time comparison so response timing does not leak the token
+    if not hmac.compare_digest((authorization or "").encode(), EXPECTED_AUTHORIZATION):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+async def prepare_answers(request: Request):
+    """
+    Parse the request, load or build the document index, and retrieve context for every question.
+    Returns the questions and one awaitable per question that resolves to its answer.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    # Handle JSON request (new format)
+    if "application/json" in content_type:
+        data = orjson.loads(await request.body())
+        questions = data.get("questions", [])
+        # Map 'documents' field to document_url for compatibility
+        document_url = data.get("documents") or data.get("document_url")
+        file = None
+
+    # Handle form data (existing format)
+    elif "multipart/form-data" in content_type:
+        form = await request.form()
+
+        # Handle questions from form
+        if "questions" in form:
+            questions_raw = form["questions"]
+            try:
+                questions = orjson.loads(questions_raw) if isinstance(questions_raw, (str, bytes)) else [questions_raw]
+            except orjson.JSONDecodeError:
+                questions = [questions_raw]
+        else:
+            questions = []
+            for key, value in form.items():
+                if key.startswith("question"):
+                    questions.append(value)
+
+        document_url = form.get("document_url")
+        file = form.get("file")
+
+    else:
+        raise HTTPException(status_code=400, detail="Content-Type must be application/json or multipart/form-data")
+
+    # Validate input
+    if not questions or not isinstance(questions, list):
+        raise HTTPException(status_code=400, detail="Questions must be provided as a non-empty list")
+    if not all(isinstance(question, str) for question in questions):
+        raise HTTPException(status_code=400, detail="Each question must be a string")
+
+    logger.info(f"Number of questions received: {len(questions)}")
+
+    # Key the index cache by upload contents or by document URL
+    if file is not None:
+        logger.info(f"Processing uploaded file: {file.filename}")
+        file_bytes = await file.read()
+        cache_key = document_cache_key(file_bytes)
+    elif document_url and document_url.startswith(("http://", "https://")):
+        logger.info(f"Processing document from URL: {document_url}")
+        cache_key = document_cache_key(document_url.encode())
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="No valid document provided. Provide either a file upload or a valid document URL."
+        )
+
+    index = load_cached_index(cache_key)
+    if index is not None:
+        logger.info("Using cached vector index, skipping download and embedding")
+    else:
+        documents = []
+
+        # 1. Load from uploaded file (for blob-based or local PDF uploads)
+        if file is not None:
+            try:
+                documents = load_pdf_documents(file_bytes, file.filename)
+                logger.info(f"Successfully loaded {len(documents)} document chunks from uploaded file")
+
+            except Exception as e:
+                logger.error(f"Failed to read uploaded file: {e}")
+                raise HTTPException(status_code=400, detail=f"Failed to read uploaded file: {str(e)}")
+
+        # 2. Load from URL if no file was uploaded
+        else:
+            try:
+                pdf_bytes = await fetch_document(document_url)
+                documents = load_pdf_documents(pdf_bytes)
+                logger.info(f"Successfully loaded {len(documents)} document chunks from URL")
+
+            except Exception as e:
+                logger.error(f"Failed to load document from URL: {e}")
+                raise HTTPException(status_code=400, detail=f"Failed to load document from URL: {str(e)}")
+
+        # 3. Create the Vector Index
+        try:
+            index = build_index(documents)
+            cache_index(cache_key, index)
+            logger.info("Successfully created vector index")
+        except Exception as e:
+            logger.error(f"Failed to create index: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to create document index: {str(e)}")
+
+    # 4. Create the Query Engine
+    query_engine = index.as_query_engine(similarity_top_k=SIMILARITY_TOP_K, response_mode="compact")
+    semantic_cache = QUERY_CACHES.setdefault(cache_key, SemanticCache(SEMANTIC_CACHE_THRESHOLD))
+
+    # Ask each distinct question once (ignoring whitespace differences); duplicates share its answer
+    question_keys = [" ".join(question.split()) for question in questions]
+    unique_questions = list(dict.fromkeys(question_keys))
+
+    # Embed all questions in one batch, off the event loop since local models run the forward pass
+    # inline, and retrieve context for all of them with one similarity matmul
+    query_embeddings = await asyncio.to_thread(Settings.embed_model.get_text_embedding_batch, unique_questions)
+    retrieved_nodes = retrieve_batch(index, query_embeddings, SIMILARITY_TOP_K)
+
+    async def answer_question(i: int, question: str, query_embedding: List[float], nodes: List[NodeWithScore]) -> str:
+        try:
+            logger.info(f"Processing question {i+1}/{len(unique_questions)}: {question[:100]}...")
+            cached_answer = ANSWER_CACHE.get((cache_key, question))
+            if cached_answer is not None:
+                logger.info(f"Answer cache hit for question {i+1}")
+                return cached_answer
+
+            cache_embedding = normalize_embedding(query_embedding)
+            cached_answer = semantic_cache.lookup(cache_embedding)
+            if cached_answer is not None:
+                logger.info(f"Semantic cache hit for question {i+1}")
+                return cached_answer
+
+            # The context is already retrieved, so only the LLM synthesis step runs here
+            async with LLM_SEMAPHORE:
+                response = await query_engine.asynthesize(QueryBundle(question, embedding=query_embedding), nodes)
+            answer_text = str(response)
+            semantic_cache.store(cache_embedding, answer_text)
+            ANSWER_CACHE.set((cache_key, question), answer_text)
+            logger.info(f"Successfully processed question {i+1}")
+            return answer_text
+
+        except Exception as e:
+            logger.error(f"Failed to process question {i+1}: {e}")
+            return f"Error processing question: {str(e)}"
+
+    answer_tasks = {
+        question: asyncio.create_task(answer_question(i, question, query_embedding, nodes))
+        for i, (question, query_embedding, nodes) in enumerate(zip(unique_questions, query_embeddings, retrieved_nodes))
+    }
+    return questions, [answer_tasks[key] for key in question_keys]
+
+@router.post("/api/v1/hackrx/run", response_model=HackathonResponse)
+async def run_submission(
+    request: Request,
+    token: None = Depends(validate_token)
+):
+    """
+    Main RAG endpoint that processes documents and answers questions.
+    Supports both JSON and form data formats.
+    """
+    try:
+        questions, pending_answers = await prepare_answers(request)
+
+        # 5. Process all questions concurrently
+        answers_with_sources = await asyncio.gather(*pending_answers)
+
+        logger.info(f"Successfully processed all {len(questions)} questions")
+        return HackathonResponse(answers=answers_with_sources)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in run_submission: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+@router.post("/api/v1/hackrx/stream")
+async def stream_submission(
+    request: Request,
+    token: None = Depends(validate_token)
+):
+    """
+    Same input as /api/v1/hackrx/run, but streams each answer as a Server-Sent Event as soon as it is ready.
+    Events are {"i": question index, "answer": text} and may arrive out of order.
+    """
+    try:
+        questions, pending_answers = await prepare_answers(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in stream_submission: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    async def indexed_answer(i: int, pending_answer):
+        return i, await pending_answer
+
+    async def events():
+        for next_answer in asyncio.as_completed([indexed_answer(i, a) for i, a in enumerate(pending_answers)]):
+            i, answer = await next_answer
+            yield b"data: " + orjson.dumps({"i": i, "answer": answer}) + b"\n\n"
+        logger.info(f"Successfully streamed all {len(questions)} answers")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
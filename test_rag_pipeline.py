@@ -0,0 +1,106 @@
+"""Offline tests for the INT8 vector store and index cache in rag_pipeline.py
+
+They need no server, API key or model download: embeddings come from a deterministic stub.
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+import rag_pipeline
+from rag_pipeline import Int8VectorStore, cache_index, load_cached_index, retrieve_batch
+
+DIM = 64
+
+
+class HashEmbedding(BaseEmbedding):
+    """Deterministic embedding that hashes each word into a signed bucket of a DIM-sized vector"""
+
+    def _embed(self, text):
+        vector = np.zeros(DIM, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.sha256(word.encode()).digest()
+            vector[digest[0] % DIM] += 1 if digest[1] & 1 else -1
+        return vector.tolist()
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._embed(query)
+
+    def _get_text_embedding(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def embed_model():
+    # Loading an index resolves Settings.embed_model, which would otherwise default to OpenAI
+    Settings.embed_model = HashEmbedding(model_name="hash")
+    return Settings.embed_model
+
+
+def random_nodes(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        TextNode(id_=f"node-{i}", text=f"chunk {i}", embedding=rng.normal(size=DIM).tolist())
+        for i in range(count)
+    ]
+
+
+def test_query_batch_matches_simple_vector_store():
+    """The INT8 search plus FP32 rerank returns the same top-k as the exact FP32 store"""
+    nodes = random_nodes(200)
+    int8_store, exact_store = Int8VectorStore(), SimpleVectorStore()
+    int8_store.add(nodes)
+    exact_store.add(nodes)
+
+    queries = np.random.default_rng(1).normal(size=(10, DIM)).tolist()
+    results = int8_store.query_batch(queries, similarity_top_k=5)
+
+    for query, result in zip(queries, results):
+        expected = exact_store.query(VectorStoreQuery(query_embedding=query, similarity_top_k=5))
+        assert result.ids == expected.ids
+        assert result.similarities == pytest.approx(expected.similarities, rel=1e-5)
+
+
+def test_empty_store():
+    """A store without embeddings, e.g. from a PDF with no text, returns no matches instead of failing"""
+    store = Int8VectorStore()
+    store.quantize()
+
+    results = store.query_batch([[1.0] * DIM, [0.5] * DIM], similarity_top_k=3)
+    assert [result.ids for result in results] == [[], []]
+
+    result = store.query(VectorStoreQuery(query_embedding=[1.0] * DIM, similarity_top_k=3))
+    assert result.ids == []
+
+
+def test_persist_and_reload(tmp_path, monkeypatch, embed_model):
+    """A persisted index reloads as an Int8VectorStore and retrieves the same chunks"""
+    monkeypatch.setattr(rag_pipeline, "INDEX_PERSIST_DIR", str(tmp_path))
+
+    texts = ["grandparents are family members", "a qualified nurse holds a license", "day care procedures"]
+    nodes = [TextNode(id_=f"node-{i}", text=text) for i, text in enumerate(texts)]
+    storage_context = StorageContext.from_defaults(vector_store=Int8VectorStore())
+    index = VectorStoreIndex(nodes=nodes, storage_context=storage_context)
+    query_embeddings = [embed_model.get_query_embedding("who is a qualified nurse")]
+    expected = retrieve_batch(index, query_embeddings, 2)
+
+    cache_index("doc", index)
+    # Only the finished directory is left behind, not the temporary one it was written to
+    assert [path.name for path in tmp_path.iterdir()] == ["doc"]
+
+    rag_pipeline.INDEX_CACHE.pop("doc")
+    reloaded = load_cached_index("doc")
+    assert isinstance(reloaded.vector_store, Int8VectorStore)
+
+    retrieved = retrieve_batch(reloaded, query_embeddings, 2)
+    assert [node.node_id for node in retrieved[0]] == [node.node_id for node in expected[0]]
+    assert retrieved[0][0].node_id == "node-1"